@@ -0,0 +1,28 @@
+# gunicorn.conf.py
+#
+# Usage: gunicorn -c gunicorn.conf.py main:app
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 3000)}"
+
+# Chart URLs carry the parameters of their chart, so any worker can serve them. Run one worker
+# process per CPU and serve concurrent requests, such as open chart streams, with threads.
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = multiprocessing.cpu_count() * 2
+
+# Chart rendering is CPU-bound; allow slow renders and long-lived SSE streams
+timeout = 120
+
+# Import matplotlib, numpy and psychrolib once in the master; workers share them copy-on-write
+preload_app = True
+
+def when_ready(_server):
+    """
+    Warms up chart rendering in the master before workers are forked, so fonts and the
+    cached psychrometric base charts are inherited by every worker.
+    """
+    from main import warm_up
+    warm_up()
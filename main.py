@@ -1,15 +1,155 @@
 # main.py
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, send_file, stream_with_context, url_for
+from flask.json.provider import DefaultJSONProvider
+from itsdangerous import BadSignature, URLSafeSerializer
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import io
+import json
+import math
 import os
 import logging
+import secrets
+import threading
 from question_types import psychrometry, wall_heat_loss, thermal_bridging
 
+try:
+    import orjson
+except ImportError:  # Fall back to Flask's default JSON provider
+    orjson = None
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    JSON provider backed by orjson, which serializes the large base64 chart strings
+    in responses much faster than the standard library encoder.
+    """
+    def dumps(self, obj, **_kwargs):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_SERIALIZE_NUMPY).decode('utf-8')
+
+    def loads(self, s, **_kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+# Signs the question parameters carried in chart URLs. Set SECRET_KEY when running several
+# server instances; gunicorn workers of one instance share the key of the preloaded app.
+app.secret_key = os.environ.get('SECRET_KEY') or secrets.token_hex(32)
+if orjson is not None:
+    app.json = OrjsonProvider(app)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)  # Set to INFO for standard logs
 
+# Bounded worker pool for chart rendering, shared by all routes
+EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+
+def warm_up():
+    """
+    Renders one chart of each type so that font loading and the cached psychrometric
+    base charts are ready before the first real request arrives.
+    Called at start-up by the development server and by gunicorn.conf.py.
+    """
+    try:
+        psychrometry.generate_solution(psychrometry.generate_question())
+        psychrometry.generate_solution(psychrometry.generate_question(), colorblind=True)
+        question = wall_heat_loss.generate_question(num_layers=3)
+        wall_heat_loss.plot_heat_loss_calculation(**question['parameters'])
+        logging.info("Chart rendering warm-up completed.")
+    except Exception as e:
+        logging.error(f"Chart rendering warm-up failed: {e}")
+
+def psychrometry_chart_query(point1, point2, colorblind, image_format):
+    """
+    Returns the query parameters addressing the chart for the Outside and Room Conditions.
+    """
+    return {
+        'T1': point1['temperature'], 'RH1': point1['relative_humidity'],
+        'T2': point2['temperature'], 'RH2': point2['relative_humidity'],
+        'colorblind': int(bool(colorblind)), 'format': image_format
+    }
+
+def psychrometry_chart_args(args):
+    """
+    Reads the query parameters made by psychrometry_chart_query back into
+    (T1, RH1, T2, RH2, colorblind, image_format), raising ValueError if any is missing or invalid.
+    """
+    conditions = []
+    for name in ('T1', 'RH1', 'T2', 'RH2'):
+        value = args.get(name, type=float)
+        if value is None or not math.isfinite(value):
+            raise ValueError(f"Missing or invalid chart parameter '{name}'.")
+        # The chart labels the conditions as given, so keep whole numbers as integers
+        conditions.append(int(value) if value.is_integer() else value)
+
+    image_format = args.get('format', 'webp')
+    if image_format not in psychrometry.IMAGE_FORMATS:
+        raise ValueError(f"Unsupported chart format '{image_format}'.")
+
+    return (*conditions, args.get('colorblind') == '1', image_format)
+
+# Keyword arguments of the heat loss chart renderers, taken from the question parameters
+CHART_PARAMETERS = ('length', 'height', 'layers', 'T_inside', 'T_outside')
+
+# Rendered heat loss charts, keyed by a hash of the renderer and its parameters, least recently used first
+_HEAT_LOSS_CHARTS = OrderedDict()
+_HEAT_LOSS_CHARTS_LOCK = threading.Lock()
+HEAT_LOSS_CHART_CACHE_SIZE = 512  # Each entry holds a PNG chart of roughly 60 KB
+CHART_MAX_AGE = 86400             # Seconds browsers may cache a parameter-addressed chart
+
+def render_cached_bar_chart(render, parameters):
+    """
+    Renders a heat loss chart for the question parameters with the given renderer.
+    Charts for parameters that were already rendered are served from the cache. The wall
+    dimensions are random, so separate questions practically never share a chart; the cache
+    serves repeated requests for the same chart URL, such as showing and then downloading it.
+    """
+    kwargs = {name: parameters[name] for name in CHART_PARAMETERS}
+    # The layers are nested dicts, so key the cache on the parameters' canonical JSON encoding
+    params_json = json.dumps(kwargs, sort_keys=True)
+    key = hashlib.blake2b(f"{render.__module__}.{render.__qualname__}:{params_json}".encode('utf-8')).digest()
+
+    with _HEAT_LOSS_CHARTS_LOCK:
+        image = _HEAT_LOSS_CHARTS.get(key)
+        if image is not None:
+            _HEAT_LOSS_CHARTS.move_to_end(key)
+            return image
+
+    image = render(**kwargs)
+
+    with _HEAT_LOSS_CHARTS_LOCK:
+        _HEAT_LOSS_CHARTS[key] = image
+        if len(_HEAT_LOSS_CHARTS) > HEAT_LOSS_CHART_CACHE_SIZE:
+            _HEAT_LOSS_CHARTS.popitem(last=False)
+    return image
+
+def heat_loss_chart_url(endpoint, parameters):
+    """
+    Returns the URL of the chart for the question parameters, served by the given endpoint.
+    The URL carries the signed parameters, so whichever worker receives it can render the chart.
+    """
+    kwargs = {name: parameters[name] for name in CHART_PARAMETERS}
+    return url_for(endpoint, params=URLSafeSerializer(app.secret_key, salt=endpoint).dumps(kwargs))
+
+def send_heat_loss_chart(render, endpoint, params):
+    """
+    Renders the chart for the signed parameters of a URL made by heat_loss_chart_url and sends it as PNG.
+    """
+    try:
+        parameters = URLSafeSerializer(app.secret_key, salt=endpoint).loads(params)
+    except BadSignature:
+        logging.error(f"Invalid chart parameters requested from {endpoint}.")
+        return jsonify({"error": "Invalid chart parameters."}), 404
+
+    try:
+        image = EXECUTOR.submit(render_cached_bar_chart, render, parameters).result()
+    except Exception as e:
+        logging.error(f"Error rendering chart for {endpoint}: {e}")
+        return jsonify({"error": "Failed to render chart."}), 500
+
+    # The chart is determined by the parameters in its URL, so browsers may keep it
+    return send_file(io.BytesIO(image), mimetype='image/png', max_age=CHART_MAX_AGE)
+
 # ----------------- Main Menu Route -----------------
 
 @app.route('/')
@@ -46,6 +186,9 @@ def show_psychrometry_solution():
     """
     Generates the solution for a multi-part psychrometric question.
     Expects JSON data with 'point1', 'point2', 'mass_flow', 'Cp', and 'colorblind' (optional).
+    Returns the answers immediately; the chart is rendered by the returned 'stream_url', which
+    carries the conditions, so any worker can serve it. The chart is WebP unless the 'format'
+    query parameter is 'png'.
     """
     data = request.get_json()
 
@@ -77,12 +220,22 @@ def show_psychrometry_solution():
         # Extract colorblind flag
         colorblind = data.get('colorblind', False)
 
-        # Generate the solution
-        solution = psychrometry.generate_solution(question_data, colorblind=colorblind)
+        # Chart image format (WebP by default, PNG as a fallback)
+        image_format = request.args.get('format', 'webp')
+        if image_format not in psychrometry.IMAGE_FORMATS:
+            logging.error(f"Invalid chart format requested: {image_format}")
+            return jsonify({"error": f"Unsupported chart format '{image_format}'."}), 400
+
+        # Generate the numeric answers now; the chart is rendered when the stream is opened
+        answers = psychrometry.generate_answers(question_data)
+        chart_query = psychrometry_chart_query(data['point1'], data['point2'], colorblind, image_format)
 
-        logging.info("Generated psychrometric chart solution successfully.")
+        logging.info("Generated psychrometric solution answers successfully.")
 
-        return jsonify(solution)
+        return jsonify({
+            "answers": answers,
+            "stream_url": url_for('stream_psychrometry_solution', **chart_query)
+        })
 
     except ValueError as ve:
         logging.error(f"ValueError: {ve}")
@@ -91,6 +244,55 @@ def show_psychrometry_solution():
         logging.error(f"Unexpected error: {e}")
         return jsonify({"error": "An unexpected error occurred while generating the solution."}), 500
 
+@app.route('/psychrometry/solution_stream')
+def stream_psychrometry_solution():
+    """
+    Streams the chart of a psychrometric solution as a Server-Sent Event once it is rendered.
+    The 'chart' event carries either 'chart_url' and the image 'chart_format', or 'error'.
+    """
+    try:
+        *conditions, colorblind, image_format = psychrometry_chart_args(request.args)
+    except ValueError as ve:
+        logging.error(f"ValueError: {ve}")
+        return jsonify({"error": str(ve)}), 400
+
+    future = EXECUTOR.submit(psychrometry.generate_condition_chart, *conditions, colorblind=colorblind, image_format=image_format)
+    # The chart URL carries the same parameters; a repeated render on this worker is served from memory
+    chart_url = url_for('psychrometry_chart', **request.args.to_dict())
+
+    def generate():
+        try:
+            future.result()
+            message = {"chart_url": chart_url, "chart_format": image_format}
+            logging.info("Generated psychrometric chart successfully.")
+        except ValueError as ve:
+            logging.error(f"ValueError: {ve}")
+            message = {"error": str(ve)}
+        except Exception as e:
+            logging.error(f"Unexpected error: {e}")
+            message = {"error": "An unexpected error occurred while generating the chart."}
+        yield f"event: chart\ndata: {app.json.dumps(message)}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+@app.route('/psychrometry/chart')
+def psychrometry_chart():
+    """
+    Serves the psychrometric chart for the conditions, colorblind flag and image format in the query parameters.
+    """
+    try:
+        *conditions, colorblind, image_format = psychrometry_chart_args(request.args)
+        image = EXECUTOR.submit(psychrometry.generate_condition_chart, *conditions, colorblind=colorblind, image_format=image_format).result()
+    except ValueError as ve:
+        logging.error(f"ValueError: {ve}")
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        logging.error(f"Error rendering psychrometric chart: {e}")
+        return jsonify({"error": "Failed to render chart."}), 500
+
+    # The chart is determined by the parameters in its URL, so browsers may keep it
+    return send_file(io.BytesIO(image), mimetype=f"image/{image_format}", max_age=CHART_MAX_AGE)
+
 
 # ----------------- Wall Heat Loss Routes -----------------
 
@@ -106,6 +308,7 @@ def generate_heat_loss_question():
     """
     Generates a wall heat loss question along with its solution.
     Expects JSON data with 'num_layers' (int).
+    The solution chart is rendered when the returned 'solution_image' URL is requested.
     """
     data = request.get_json()
 
@@ -125,21 +328,14 @@ def generate_heat_loss_question():
         question = wall_heat_loss.generate_question(num_layers=num_layers)
         logging.info(f"Generated wall heat loss question with {num_layers} layers successfully.")
 
-        # Generate the solution (heat loss chart)
-        solution_image = wall_heat_loss.plot_heat_loss_calculation(
-            length=question['parameters']['length'],
-            height=question['parameters']['height'],
-            layers=question['parameters']['layers'],
-            T_inside=question['parameters']['T_inside'],
-            T_outside=question['parameters']['T_outside']
-        )
-        logging.info("Generated wall heat loss chart successfully.")
+        # Address the solution chart by the question parameters; it is rendered when requested
+        solution_url = heat_loss_chart_url('heat_loss_chart', question['parameters'])
 
         # Prepare the response
         response = {
             "prompt": question['prompt'],
             "parameters": question['parameters'],
-            "solution_image": solution_image  # Base64-encoded image
+            "solution_image": solution_url  # URL of the solution chart
         }
 
         return jsonify(response)
@@ -151,6 +347,13 @@ def generate_heat_loss_question():
         logging.error(f"Unexpected error during wall heat loss question/solution generation: {e}")
         return jsonify({"error": "An unexpected error occurred while generating the wall heat loss question and solution."}), 500
 
+@app.route('/heat_loss/chart/<params>')
+def heat_loss_chart(params):
+    """
+    Serves the wall heat loss chart for the signed question parameters in the URL.
+    """
+    return send_heat_loss_chart(wall_heat_loss.render_heat_loss_chart, 'heat_loss_chart', params)
+
 # ----------------- Thermal Bridging Routes -----------------
 
 @app.route('/thermal_bridging')
@@ -165,6 +368,7 @@ def generate_thermal_bridging_question():
     """
     Generates a thermal bridging heat loss question along with its solution.
     Expects JSON data with 'num_layers' (int).
+    The solution chart is rendered when the returned 'solution_image' URL is requested.
     """
     data = request.get_json()
 
@@ -184,21 +388,14 @@ def generate_thermal_bridging_question():
         question = thermal_bridging.generate_thermal_bridging_question(num_layers=num_layers)
         logging.info(f"Generated thermal bridging question with {num_layers} layers successfully.")
 
-        # Generate the solution (thermal bridging heat loss chart)
-        solution_image = thermal_bridging.plot_thermal_bridging_calculation(
-            length=question['parameters']['length'],
-            height=question['parameters']['height'],
-            layers=question['parameters']['layers'],
-            T_inside=question['parameters']['T_inside'],
-            T_outside=question['parameters']['T_outside']
-        )
-        logging.info("Generated thermal bridging heat loss chart successfully.")
+        # Address the solution chart by the question parameters; it is rendered when requested
+        solution_url = heat_loss_chart_url('thermal_bridging_chart', question['parameters'])
 
         # Prepare the response
         response = {
             "prompt": question['prompt'],
             "parameters": question['parameters'],
-            "solution_image": solution_image  # Base64-encoded image
+            "solution_image": solution_url  # URL of the solution chart
         }
 
         return jsonify(response)
@@ -210,7 +407,16 @@ def generate_thermal_bridging_question():
         logging.error(f"Unexpected error during thermal bridging question/solution generation: {e}")
         return jsonify({"error": "An unexpected error occurred while generating the thermal bridging question and solution."}), 500
 
+@app.route('/thermal_bridging/chart/<params>')
+def thermal_bridging_chart(params):
+    """
+    Serves the thermal bridging heat loss chart for the signed question parameters in the URL.
+    """
+    return send_heat_loss_chart(thermal_bridging.render_thermal_bridging_chart, 'thermal_bridging_chart', params)
+
 if __name__ == '__main__':
+    # Development server. In production run: gunicorn -c gunicorn.conf.py main:app
+    EXECUTOR.submit(warm_up)
     # For environments like Replit, use host='0.0.0.0' and a specific port
     port = int(os.environ.get("PORT", 3000))
-    app.run(host='0.0.0.0', port=port, debug=True)
+    app.run(host='0.0.0.0', port=port)
@@ -0,0 +1,241 @@
+# question_types/_thermal_common.py
+
+import numpy as np
+import io
+import binascii
+import collections
+import functools
+import logging
+import json
+import os
+import pathlib
+import threading
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library JSON parser
+    orjson = None
+
+# Directory holding the data files of each question type
+DATA_ROOT = pathlib.Path(__file__).resolve().parent.parent / 'Data'
+
+# Resolution of the chart image, suited to display in the browser
+CHART_DPI = 100
+
+# Random number generator for the question parameters. Draws are converted to plain Python
+# numbers, so that the questions stay JSON-serializable.
+RNG = np.random.default_rng()
+
+def _reseed_rng():
+    """
+    Gives a forked process (e.g. a gunicorn worker of the preloaded app) its own random sequence,
+    instead of the one inherited from the parent. Reseeded in place, as the modules hold RNG itself.
+    """
+    RNG.bit_generator.state = np.random.PCG64().state
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reseed_rng)
+
+def random_choice(options):
+    """
+    Returns a randomly chosen element of a list or tuple, as the element itself.
+    """
+    return options[RNG.integers(len(options))]
+
+# One record per material, combining its k-value, R-value and standard thicknesses (mm),
+# so that a layer needs a single lookup. Values a material does not have are None or empty.
+Material = collections.namedtuple('Material', 'k R thicknesses')
+NO_MATERIAL = Material(None, None, ())
+
+# Each data file is parsed once per process; callers must not modify the returned data
+@functools.lru_cache(maxsize=None)
+def load_data(data_dir, file_name):
+    """
+    Utility function to load JSON data from a data file.
+
+    Parameters:
+    - data_dir (pathlib.Path): Data directory of the question type, e.g. DATA_ROOT / 'Walls'.
+    - file_name (str): Name of the JSON file.
+
+    Returns:
+    - dict: Parsed JSON data.
+    """
+    file_path = data_dir / file_name
+    logging.debug(f"Attempting to load file: {file_path}")
+    try:
+        raw = file_path.read_bytes()
+        data = orjson.loads(raw) if orjson is not None else json.loads(raw)
+        logging.info(f"Loaded data from {file_path.name} successfully.")
+        return data
+    except FileNotFoundError:
+        logging.error(f"File {file_path.name} not found in {data_dir}.")
+        if data_dir.exists():
+            available_files = [path.name for path in data_dir.iterdir()]
+            logging.error(f"Available files in {data_dir}: {available_files}")
+        else:
+            logging.error(f"Directory {data_dir} does not exist.")
+        raise
+    except json.JSONDecodeError as e:  # Also raised by orjson
+        logging.error(f"Error decoding JSON from file {file_path.name}: {e}")
+        raise
+
+def compute_R_values(layers, Rsi, Rso, mixed_layer=None):
+    """
+    Calculates the thermal resistance of each layer of a wall, including the surface resistances.
+
+    Parameters:
+    - layers (list of dict): Each dict contains 'material', 'thickness' (m), 'k' (W/mK) or 'R' (m²K/W).
+    - Rsi (float): Internal surface resistance in m²K/W.
+    - Rso (float): External surface resistance in m²K/W.
+    - mixed_layer (callable, optional): Called with each layer that has 'insulation' and returns
+      the name and R-value (m²K/W) to chart for it. Without it, such layers are not accepted.
+
+    Returns:
+    - tuple: Layer names (list of str) and R-values (ndarray), from the inside surface outwards.
+    """
+    # Insert Rsi at the beginning and Rso at the end of the layers
+    layers_with_surfaces = [{'material': 'Internal Surface (Rsi)', 'thickness': 0, 'R': Rsi}] + layers + [{'material': 'External Surface (Rso)', 'thickness': 0, 'R': Rso}]
+
+    # Layers with a given R (or mixed layers) are filled in directly, layers with k are gathered
+    # and divided in one step
+    R_values = np.empty(len(layers_with_surfaces))
+    layer_names = []
+    k_indices = []
+    for i, layer in enumerate(layers_with_surfaces):
+        material = layer.get('material')
+        if mixed_layer is not None and 'insulation' in layer:
+            name, R_values[i] = mixed_layer(layer)
+            layer_names.append(name)
+        elif 'k' in layer and layer['k'] is not None:
+            k_indices.append(i)
+            layer_names.append(material)
+        elif 'R' in layer:
+            R_values[i] = layer['R']
+            layer_names.append(material)
+            logging.debug("Layer '%s' has R = %s m²K/W", material, layer['R'])
+        else:
+            required = "'k', 'R', or 'insulation'" if mixed_layer is not None else "'k' or 'R'"
+            error_msg = f"Layer '{material}' must have either {required} defined."
+            logging.error(error_msg)
+            raise ValueError(error_msg)
+
+    thicknesses = np.fromiter((layers_with_surfaces[i]['thickness'] for i in k_indices), dtype=float, count=len(k_indices))
+    k_values = np.fromiter((layers_with_surfaces[i]['k'] for i in k_indices), dtype=float, count=len(k_indices))
+    R_values[k_indices] = thicknesses / k_values
+    logging.debug("Layer R-values: %s m²K/W", R_values)
+    return layer_names, R_values
+
+# One figure per chart title and thread, reused across renders, so concurrent renders never share
+# a figure. Charts are rendered on the application's fixed pool of worker threads, which bounds the count.
+_THREAD_FIGURES = threading.local()
+
+def _figure(title):
+    """
+    Returns this thread's figure and axes for the given chart title, with the previous chart's bars
+    and labels removed. The title, axis label and grid are the same for every chart and are set up only once.
+    """
+    # Imported on first use, so that importing the question modules to generate questions does not
+    # load matplotlib. The figures are drawn on the Agg canvas directly, bypassing pyplot.
+    from matplotlib import rcParams
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figures = getattr(_THREAD_FIGURES, 'figures', None)
+    if figures is None:
+        figures = _THREAD_FIGURES.figures = {}
+    if title not in figures:
+        fig = Figure(figsize=(10, 6))
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot(111)
+        ax.set_xlabel('Thermal Resistance (m²K/W)', fontsize=14)
+        ax.set_title(title, fontsize=16)
+        ax.grid(axis='x', linestyle='--', alpha=0.7)
+        figures[title] = fig, ax
+    fig, ax = figures[title]
+    for artist in ax.containers + ax.texts:
+        artist.remove()
+    # Rescale to the new chart's bars only
+    ax.relim()
+    # Undo the previous chart's tight_layout, which starts from the current margins
+    fig.subplots_adjust(**{side: rcParams[f'figure.subplot.{side}'] for side in ('left', 'right', 'bottom', 'top')})
+    return fig, ax
+
+# Text box styles of the R-value labels placed outside their bars and of the totals annotation.
+# matplotlib copies the style for each text, so they are shared across charts.
+_BBOX_OUT = {'facecolor': 'white', 'edgecolor': 'none', 'alpha': 0.7}
+_BBOX_ANNOT = {'facecolor': 'white', 'alpha': 0.8, 'edgecolor': 'black'}
+
+def render_bar_chart(title, layer_names, R_values, Q, R_total, U_value, dpi=CHART_DPI):
+    """
+    Plots the thermal resistance of each wall layer as a horizontal bar chart, annotated with the totals.
+
+    Parameters:
+    - title (str): Chart title.
+    - layer_names (list of str): Name of each layer.
+    - R_values (ndarray): Thermal resistance of each layer in m²K/W.
+    - Q (float): Heat loss in W.
+    - R_total (float): Total thermal resistance in m²K/W.
+    - U_value (float): Overall U-value in W/m²K.
+    - dpi (int): Resolution of the image.
+
+    Returns:
+    - bytes: PNG image.
+    """
+    fig, ax = _figure(title)
+
+    # Use a fixed sky blue color for all bars
+    bar_color = 'skyblue'
+
+    # Bars are placed at numeric positions and labelled through the ticks, as the layer names
+    # differ from chart to chart on the reused axes
+    y_positions = np.arange(len(layer_names))
+    ax.barh(y_positions, R_values, color=bar_color, edgecolor='black')
+    ax.set_yticks(y_positions, layer_names)
+
+    # Determine the maximum R-value
+    max_R = R_values.max()
+    threshold = 0.2 * max_R  # 20% of the maximum R-value
+    logging.info("Max R-value: %s m²K/W, Threshold for label positioning: %s m²K/W", max_R, threshold)
+
+    # Place labels of short bars outside the bar to the right with white background,
+    # and the others inside the bar with black text
+    outside = R_values <= threshold
+    label_x = np.where(outside, R_values + 0.02, R_values / 2)
+    labels = np.char.mod('R = %.2f m²K/W', R_values)
+    # Bars are centred on their y positions, so the labels share them
+    for R, x, y, label, is_outside in zip(R_values, label_x, y_positions, labels, outside, strict=True):
+        ax.text(x, y,
+                 label,
+                 va='center', ha='left' if is_outside else 'center', color='black', fontsize=10,
+                 bbox=_BBOX_OUT if is_outside else None)
+        logging.debug("Placed R-value label %s for R = %s", 'outside' if is_outside else 'inside', R)
+
+    # Annotate total thermal resistance, heat loss, and U-value
+    annotation_text = (
+        f'R_total = {R_total:.2f} m²K/W\n'
+        f'Heat Loss Q = {Q:.2f} W\n'
+        f'U-value (Overall) = {U_value:.2f} W/m²K'
+    )
+    ax.text(1.02, 0.95, annotation_text,
+             horizontalalignment='left',
+             verticalalignment='top',
+             transform=ax.transAxes,
+             bbox=_BBOX_ANNOT)
+    logging.debug("Added annotations to the chart.")
+
+    # Adjust layout to accommodate annotations; this also keeps them inside the image, so the
+    # figure is saved as is rather than measured and cropped with bbox_inches='tight'
+    fig.set_dpi(dpi)
+    fig.tight_layout()
+
+    # Save the plot to a BytesIO object
+    buf = io.BytesIO()
+    fig.canvas.print_png(buf)
+    return buf.getvalue()
+
+def png_data_uri(image):
+    """
+    Encodes PNG image bytes as a base64 data URI.
+    """
+    encoded_image = binascii.b2a_base64(image, newline=False).decode('ascii')
+    return f"data:image/png;base64,{encoded_image}"
@@ -1,177 +1,216 @@
 # question_types/psychrometry.py
 
-import matplotlib
-matplotlib.use('Agg')  # Use the non-interactive Agg backend
-import matplotlib.pyplot as plt
+from PIL import Image
 import numpy as np
 import psychrolib
 from psychrolib import (
     GetHumRatioFromRelHum,
     GetTDewPointFromRelHum,
-    GetMoistAirEnthalpy,
-    GetTDryBulbFromEnthalpyAndHumRatio
+    GetMoistAirEnthalpy
 )
-from scipy.optimize import brentq
 import io
-import base64
+import binascii
+import contextlib
+import copy
+import functools
+import queue
 import random
 import logging
+import threading
 
 # Initialize PsychroLib to use SI units
 psychrolib.SetUnitSystem(psychrolib.SI)
 
-def find_T_sat(w2, pressure=101325):
+# Saturation curve lookup table resolution for find_T_sat (°C)
+_T_SAT_MIN = -10
+_T_SAT_MAX = 60
+_T_SAT_STEP = 0.1
+
+@functools.lru_cache(maxsize=None)
+def _saturation_table(pressure=101325):
     """
-    Finds the dry-bulb temperature on the saturation curve for a given moisture content w2.
+    Tabulates the saturation moisture content over [_T_SAT_MIN, _T_SAT_MAX] °C.
+    Returns the temperature and moisture content arrays; both are monotonically increasing.
     """
-    def func(T):
-        try:
-            return psychrolib.GetHumRatioFromRelHum(T, 1.0, pressure) - w2
-        except:
-            return 1e6  # Return a large value if computation fails
+    T_table = np.arange(_T_SAT_MIN, _T_SAT_MAX + _T_SAT_STEP / 2, _T_SAT_STEP)
+    w_table = np.vectorize(GetHumRatioFromRelHum, otypes=[float])(T_table, 1.0, pressure)
+    return T_table, w_table
 
-    T_min = -10
-    T_max = 60
+# Build the table for standard atmospheric pressure up front
+_saturation_table()
 
-    try:
-        w_min = psychrolib.GetHumRatioFromRelHum(T_min, 1.0, pressure)
-        w_max = psychrolib.GetHumRatioFromRelHum(T_max, 1.0, pressure)
-    except Exception as e:
-        raise ValueError("Unable to compute saturation moisture content at the defined temperature bounds.")
+def find_T_sat(w2, pressure=101325):
+    """
+    Finds the dry-bulb temperature on the saturation curve for a given moisture content w2.
+    """
+    T_table, w_table = _saturation_table(pressure)
+    w_min = w_table[0]
+    w_max = w_table[-1]
 
     if w2 < w_min or w2 > w_max:
         raise ValueError(f"Moisture content w2={w2:.5f} kg/kg is outside the saturation curve range ({w_min:.5f} to {w_max:.5f} kg/kg).")
 
-    T_sat = brentq(func, T_min, T_max)
-    return T_sat
+    # Invert the monotonic saturation curve by linear interpolation in the table
+    i = min(max(int(np.searchsorted(w_table, w2)), 1), len(w_table) - 1)
+    slope = (T_table[i] - T_table[i - 1]) / (w_table[i] - w_table[i - 1])
+    T_sat = T_table[i - 1] + (w2 - w_table[i - 1]) * slope
+
+    # Refine with one Newton step against the exact curve, using the table slope as dT/dw
+    T_sat += (w2 - GetHumRatioFromRelHum(T_sat, 1.0, pressure)) * slope
+    return float(T_sat)
 
-def plot_psychrometric_chart(point1, point2, colorblind=False):
+# Questions use integer conditions from a small range, so the same points recur often
+@functools.lru_cache(maxsize=1024)
+def _point_properties(T, RH):
     """
-    Plots a psychrometric chart based on the provided two points and draws cooling and reheat lines.
-    Returns a base64-encoded image.
+    Computes the moisture content (kg/kg), Dew Point temperature (°C) and enthalpy (kJ/kg)
+    of the state point at dry-bulb temperature T (°C) and relative humidity RH (%). Results are memoized.
     """
-    # Extract temperatures and relative humidities
-    T1, RH1 = point1
-    T2, RH2 = point2
-
-    # Ensure Point 2 has a lower temperature than Point 1
-    if T2 >= T1:
-        raise ValueError("Room Condition must have a lower temperature than Outside Condition.")
-
-    # Calculate moisture contents
-    try:
-        w1 = GetHumRatioFromRelHum(T1, RH1 / 100.0, 101325)
-    except Exception as e:
-        raise ValueError(f"Invalid moisture content for Outside Condition: {e}")
-
-    try:
-        w2 = GetHumRatioFromRelHum(T2, RH2 / 100.0, 101325)
-    except Exception as e:
-        raise ValueError(f"Invalid moisture content for Room Condition: {e}")
+    w = GetHumRatioFromRelHum(T, RH / 100.0, 101325)
+    dew_point = GetTDewPointFromRelHum(T, RH / 100.0)
+    h = GetMoistAirEnthalpy(T, w)/1000
+    return w, dew_point, h
+
+# Color schemes for the chart, keyed by the colorblind flag
+COLOR_SCHEMES = {
+    False: {
+        # Standard color scheme with requested changes
+        "rh_line": 'grey',                   # Non-50% RH lines
+        "rh50_line": '#00008B',              # Dark Blue (almost black) for 50% RH
+        "saturation": '#00008B',             # Dark Blue (same as 50% RH) for 100% RH
+        "enthalpy": 'orange',                # Enthalpy lines
+        "point1": 'red',                     # Outside Condition
+        "point2": 'green',                   # Room Condition
+        "cooling_line": 'blue',              # Cooling Line
+        "reheat_line": 'red',                # Reheat Line (changed to red)
+        "cooling_point": 'blue',             # Cooling Point (same as cooling line)
+    },
+    True: {
+        # Color-blind-friendly color scheme
+        "rh_line": '#8DD3C7',                # Light Blue
+        "rh50_line": '#FFED6F',              # Yellow
+        "saturation": '#BEBADA',             # Lavender
+        "enthalpy": '#FB8072',               # Salmon
+        "point1": '#FDB462',                 # Orange
+        "point2": '#80B1D3',                 # Blue
+        "cooling_line": '#80B1D3',           # Blue
+        "reheat_line": '#FB8072',            # Salmon
+        "cooling_point": '#80B1D3',          # Blue
+    },
+}
+
+# Output formats for the chart image, mapped to their Pillow encoder options
+IMAGE_FORMATS = {
+    "webp": {"quality": 85, "method": 4},
+    "png": {"compress_level": 3},  # ~35% faster than the default level 6 at about the same size
+}
+
+# The chart grid never changes between requests, so it is drawn once and its rendered pixels
+# are reused. Rendered base charts are pooled per (colorblind, dpi): each render checks one out,
+# so concurrent renders draw on separate figures, and the pool grows only to the peak concurrency.
+_BASE_CHART_POOLS = {}
+_BASE_CHART_POOLS_LOCK = threading.Lock()
+
+# Default resolution of the chart image
+CHART_DPI = 120
+
+# The chart layout is fixed, so the figure is sized to its content and the axes margins are
+# set by hand instead of measuring and cropping to the drawn extent (savefig's bbox_inches='tight')
+_CHART_FIGSIZE = (12, 8.65)
+_CHART_MARGINS = {'left': 0.02, 'right': 0.925, 'bottom': 0.07, 'top': 0.955}
+
+# Chart grid: dry-bulb temperature range (°C) and relative humidity levels (%)
+_T_DB = np.arange(-10, 61, 1)  # from -10°C to 60°C
+_RH_LEVELS = np.array([10, 20, 30, 40, 50, 60, 70, 80, 90, 100])
+
+@functools.lru_cache(maxsize=4)
+def _rh_grid(pressure=101325):
+    """
+    Computes the moisture content of the constant RH curves for every (RH, T) combination
+    of the chart grid in a single call. The curves depend only on the pressure, so they are
+    computed once per pressure. Returns a read-only array of shape (len(_RH_LEVELS), len(_T_DB));
+    the last row is the saturation curve (100% RH).
+    """
+    T_grid, RH_grid = np.meshgrid(_T_DB, _RH_LEVELS / 100.0)
+    w_grid = np.vectorize(GetHumRatioFromRelHum, otypes=[float])(T_grid, RH_grid, pressure)
+    w_grid.setflags(write=False)  # Shared by every caller
+    return w_grid
 
-    # Find intermediate cooling point on the saturation line with moisture content w2
-    T_sat = find_T_sat(w2)
+# Build the curves for standard atmospheric pressure up front
+_rh_grid()
 
-    # Define the range for dry-bulb temperature (°C)
-    T_db = np.arange(-10, 61, 1)  # from -10°C to 60°C
+# Enthalpy lines: moisture content samples (kg/kg) and enthalpy levels
+_W_ENTH = np.linspace(0, 0.030, 100)  # 0 to 0.030 kg/kg
+_H_ENTH = np.arange(0, 1000, 100)     # Example: every 100 kJ/kg
 
-    # Define Relative Humidity (RH) levels
-    RH_levels = [10, 20, 30, 40, 50, 60, 70, 80, 90, 100]
+def _enthalpy_line_grid(h_levels, w_values):
+    """
+    Computes the dry-bulb temperature along every enthalpy line (h_levels in kJ/kg).
+    Returns an array of shape (len(h_levels), len(w_values)).
+    """
+    # Closed form of GetTDryBulbFromEnthalpyAndHumRatio (ASHRAE Handbook - Fundamentals (2017)
+    # ch. 1 eqn 30, SI), evaluated for all lines at once
+    h = np.asarray(h_levels, dtype=float)[:, np.newaxis]
+    w = np.maximum(np.asarray(w_values, dtype=float), psychrolib.MIN_HUM_RATIO)[np.newaxis, :]
+    return (h - 2501.0 * w) / (1.006 + 1.86 * w)
 
-    plt.figure(figsize=(14, 10))
+_T_ENTH_GRID = _enthalpy_line_grid(_H_ENTH, _W_ENTH)
 
-    # Define color schemes
-    if not colorblind:
-        # Standard color scheme with requested changes
-        rh_line_color = 'grey'               # Non-50% RH lines
-        rh50_line_color = '#00008B'          # Dark Blue (almost black) for 50% RH
-        saturation_color = '#00008B'         # Dark Blue (same as 50% RH) for 100% RH
-        enthalpy_color = 'orange'            # Enthalpy lines
-        point1_color = 'red'                 # Outside Condition
-        point2_color = 'green'               # Room Condition
-        cooling_line_color = 'blue'          # Cooling Line
-        reheat_line_color = 'red'            # Reheat Line (changed to red)
-        cooling_point_color = 'blue'         # Cooling Point (same as cooling line)
-    else:
-        # Color-blind-friendly color scheme
-        rh_line_color = '#8DD3C7'            # Light Blue
-        rh50_line_color = '#FFED6F'          # Yellow
-        saturation_color = '#BEBADA'         # Lavender
-        enthalpy_color = '#FB8072'           # Salmon
-        point1_color = '#FDB462'             # Orange
-        point2_color = '#80B1D3'             # Blue
-        cooling_line_color = '#80B1D3'       # Blue
-        reheat_line_color = '#FB8072'        # Salmon
-        cooling_point_color = '#80B1D3'      # Blue
-
-    # Plot constant RH lines
-    for RH in RH_levels:
-        w = []
-        for T in T_db:
-            try:
-                w_val = GetHumRatioFromRelHum(T, RH / 100.0, 101325)
-                w.append(w_val)
-            except:
-                w.append(np.nan)
-
-        # Highlight the 50% RH line
-        if RH == 50:
-            plt.plot(T_db, w, linestyle='-', color=rh50_line_color, linewidth=2.5, label='_nolegend_')
-        else:
-            plt.plot(T_db, w, linestyle='--', color=rh_line_color, label='_nolegend_')
+def _build_base_chart(colors, dpi=CHART_DPI):
+    """
+    Draws the static part of the psychrometric chart (RH lines, saturation curve,
+    enthalpy lines, axes and ticks) and renders it once.
+    Returns the Figure, the Axes, the rendered background, the legend, and the point markers and
+    process line collections that are updated per request.
+    """
+    # matplotlib is only needed to draw charts, so it is imported on first use rather than
+    # with this module; generating questions and answers never loads it
+    from matplotlib import rcParams
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.collections import LineCollection
+    from matplotlib.figure import Figure
+    from matplotlib.legend import Legend
+    from matplotlib.lines import Line2D
+
+    # Build the figure directly on an Agg canvas; it is kept for the life of the
+    # process, so it is not registered with pyplot
+    fig = Figure(figsize=_CHART_FIGSIZE, dpi=dpi)
+    FigureCanvasAgg(fig)
+    fig.subplots_adjust(**_CHART_MARGINS)
+    ax = fig.add_subplot()
+
+    # Plot constant RH lines. The dashed lines share one style, so they are drawn as a
+    # single collection; zorder matches plot() so the stacking order is unchanged.
+    line_width = rcParams['lines.linewidth']
+    w_rh = _rh_grid()
+    rh_segments = [np.column_stack((_T_DB, w)) for RH, w in zip(_RH_LEVELS, w_rh, strict=True) if RH != 50]
+    ax.add_collection(LineCollection(rh_segments, linestyles='--', colors=colors["rh_line"], linewidths=line_width, zorder=2))
+
+    # Highlight the 50% RH line
+    ax.plot(_T_DB, w_rh[_RH_LEVELS == 50][0], linestyle='-', color=colors["rh50_line"], linewidth=2.5, label='_nolegend_')
 
     # Plot saturation curve (100% RH)
-    w_saturation = []
-    for T in T_db:
-        try:
-            w_s = GetHumRatioFromRelHum(T, 1.0, 101325)
-            w_saturation.append(w_s)
-        except:
-            w_saturation.append(np.nan)
-    plt.plot(T_db, w_saturation, label='Saturation (100% RH)', color=saturation_color, linewidth=2)
+    saturation_line, = ax.plot(_T_DB, w_rh[-1], label='Saturation (100% RH)', color=colors["saturation"], linewidth=2)
 
     # Plot enthalpy lines (optional)
-    enthalpy_values = np.arange(0, 1000, 100)  # Example: every 100 kJ/kg
-    for h in enthalpy_values:
-        w_enthalpy = []
-        T_enthalpy = []
-        for w in np.linspace(0, 0.030, 100):  # 0 to 0.030 kg/kg
-            try:
-                T = GetTDryBulbFromEnthalpyAndHumRatio(h, w, 101325)
-                w_enthalpy.append(w)
-                T_enthalpy.append(T)
-            except:
-                continue
-        plt.plot(T_enthalpy, w_enthalpy, linestyle=':', color=enthalpy_color, label='_nolegend_')
-
-    # Plot Outside Condition and Room Condition
-    plt.plot(T1, w1, 'o', label=f'Outside Condition: {T1}°C, {RH1}% RH', markersize=8, color=point1_color)
-    plt.plot(T2, w2, 'o', label=f'Room Condition: {T2}°C, {RH2}% RH', markersize=8, color=point2_color)
-
-    # Plot intermediate cooling point
-    plt.plot(T_sat, w2, 'o', label=f'Cooling Point: {T_sat:.2f}°C, {w2:.3f} kg/kg', markersize=8, color=cooling_point_color)
-
-    # Draw Cooling Line from Outside Condition to Cooling Point
-    plt.plot([T1, T_sat], [w1, w2], linestyle='-', color=cooling_line_color, linewidth=2, label='Cooling Line')
-
-    # Draw Reheat Line from Cooling Point to Room Condition
-    plt.plot([T_sat, T2], [w2, w2], linestyle='-', color=reheat_line_color, linewidth=2, label='Reheat Line')
+    enthalpy_segments = [np.column_stack((T, _W_ENTH)) for T in _T_ENTH_GRID]
+    ax.add_collection(LineCollection(enthalpy_segments, linestyles=':', colors=colors["enthalpy"], linewidths=line_width, zorder=2))
 
     # Customize the plot
-    plt.title('Psychrometric Chart Solution', fontsize=16)
-    plt.xlabel('Dry-Bulb Temperature (°C)', fontsize=14)
-    plt.ylabel('Moisture Content (kg/kg)', fontsize=14)  # Updated label
-    plt.grid(True, which='both', linestyle='--', linewidth=0.5)
+    ax.set_title('Psychrometric Chart Solution', fontsize=16)
+    ax.set_xlabel('Dry-Bulb Temperature (°C)', fontsize=14)
+    ax.set_ylabel('Moisture Content (kg/kg)', fontsize=14)  # Updated label
+    ax.grid(True, which='both', linestyle='--', linewidth=0.5)
 
     # Move Y-axis to the right
-    ax = plt.gca()
     ax.yaxis.tick_right()
     ax.yaxis.set_label_position("right")
     ax.set_ylim(0, 0.030)   # 0 to 0.030 kg/kg
 
     # Set Y-axis ticks at increments of 0.001 kg/kg
+    # with labels fixed to three decimal places
     y_ticks = np.arange(0, 0.031, 0.001)  # Up to 0.030 kg/kg
-    ax.set_yticks(y_ticks)
+    ax.set_yticks(y_ticks, labels=[f'{y:.3f}' for y in y_ticks])
 
     # Set X-axis ticks at increments of 5°C
     x_ticks = np.arange(-10, 65, 5)  # Up to 60°C
@@ -179,26 +218,135 @@ def plot_psychrometric_chart(point1, point2, colorblind=False):
 
     ax.set_xlim(-10, 60)    # -10°C to 60°C
 
-    # Adjust Y-axis labels to display up to three decimal places
-    ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, _: f'{x:.3f}'))
+    # The legend entries are the same for every request; only the labels of the three points
+    # change. Build it once without attaching it to the axes, so it stays out of the background
+    # and is drawn on top per request.
+    point_style = {'marker': 'o', 'linestyle': 'None', 'markersize': 8}
+    legend_entries = [
+        (saturation_line, 'Saturation (100% RH)'),
+        (Line2D([], [], color=colors["point1"], **point_style), 'Outside Condition'),
+        (Line2D([], [], color=colors["point2"], **point_style), 'Room Condition'),
+        (Line2D([], [], color=colors["cooling_point"], **point_style), 'Cooling Point'),
+        (Line2D([], [], linestyle='-', color=colors["cooling_line"], linewidth=2), 'Cooling Line'),
+        (Line2D([], [], linestyle='-', color=colors["reheat_line"], linewidth=2), 'Reheat Line'),
+    ]
+    legend = Legend(ax, *zip(*legend_entries, strict=True), loc='upper left', fontsize='small', ncol=2, framealpha=0.9)
+
+    # Per-request artists: the three points as one scatter and the cooling and reheat lines as
+    # one collection. Their data is set per request; being animated keeps them out of the background.
+    markers = ax.scatter(np.zeros(3), np.zeros(3), s=8 ** 2, linewidths=1.0, animated=True,
+                         c=[colors["point1"], colors["point2"], colors["cooling_point"]])
+    segments = LineCollection([], colors=[colors["cooling_line"], colors["reheat_line"]], linewidths=2, animated=True)
+    ax.add_collection(segments)
+
+    # Render the grid once and keep its pixels; requests only draw their own artists on top
+    fig.canvas.draw()
+    background = fig.canvas.copy_from_bbox(fig.bbox)
+
+    return fig, ax, background, legend, markers, segments
+
+@contextlib.contextmanager
+def _base_chart(colorblind, dpi=CHART_DPI):
+    """
+    Checks out a base chart for the requested color scheme and resolution for the duration of
+    the block, building a new one if all pooled charts are in use.
+    """
+    key = (colorblind, dpi)
+    with _BASE_CHART_POOLS_LOCK:
+        if key not in _BASE_CHART_POOLS:
+            _BASE_CHART_POOLS[key] = queue.SimpleQueue()
+        pool = _BASE_CHART_POOLS[key]
 
-    # Enhance legend: include relevant labels
-    handles, labels = ax.get_legend_handles_labels()
-    filtered = [(h, l) for h, l in zip(handles, labels) if l != '_nolegend_']
-    if filtered:
-        plt.legend(*zip(*filtered), loc='upper left', fontsize='small', ncol=2, framealpha=0.9)
+    try:
+        chart = pool.get_nowait()
+    except queue.Empty:
+        chart = _build_base_chart(COLOR_SCHEMES[colorblind], dpi)
+    try:
+        yield chart
+    finally:
+        pool.put(chart)
 
-    # Save the plot to a BytesIO object
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', dpi=300, bbox_inches='tight')
-    plt.close()
-    buf.seek(0)
+def plot_psychrometric_chart(point1, point2, colorblind=False, image_format="webp", dpi=CHART_DPI):
+    """
+    Plots a psychrometric chart based on the provided two points and draws cooling and reheat lines.
+    Returns a base64-encoded image in the requested format ('webp' or 'png') at the given resolution.
+    """
+    image = render_psychrometric_chart(point1, point2, colorblind=colorblind, image_format=image_format, dpi=dpi)
+    return _to_data_uri(image, image_format)
 
-    # Encode the image to base64
-    encoded_image = base64.b64encode(buf.read()).decode('utf-8')
-    image_data = f"data:image/png;base64,{encoded_image}"
+def _to_data_uri(image, image_format):
+    """
+    Encodes raw image bytes as a base64 data URI.
+    """
+    encoded_image = binascii.b2a_base64(image, newline=False).decode('ascii')
+    return f"data:image/{image_format};base64,{encoded_image}"
 
-    return image_data
+def _validate_conditions(T1, RH1, T2, RH2):
+    """
+    Checks that the Outside and Room Conditions describe a cooling and reheat process,
+    raising ValueError otherwise. Returns their moisture contents (w1, w2).
+    """
+    # Ensure Point 2 has a lower temperature than Point 1
+    if T2 >= T1:
+        raise ValueError("Room Condition must have a lower temperature than Outside Condition.")
+
+    # Calculate moisture contents
+    try:
+        w1 = GetHumRatioFromRelHum(T1, RH1 / 100.0, 101325)
+    except Exception as e:
+        raise ValueError(f"Invalid moisture content for Outside Condition: {e}") from e
+
+    try:
+        w2 = GetHumRatioFromRelHum(T2, RH2 / 100.0, 101325)
+    except Exception as e:
+        raise ValueError(f"Invalid moisture content for Room Condition: {e}") from e
+
+    return w1, w2
+
+def render_psychrometric_chart(point1, point2, colorblind=False, image_format="webp", dpi=CHART_DPI):
+    """
+    Plots a psychrometric chart based on the provided two points and draws cooling and reheat lines.
+    Returns the raw image bytes in the requested format ('webp' or 'png') at the given resolution.
+    """
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Unsupported image format '{image_format}'. Use one of: {', '.join(IMAGE_FORMATS)}.")
+
+    # Extract temperatures and relative humidities
+    T1, RH1 = point1
+    T2, RH2 = point2
+
+    # Validate the conditions and calculate moisture contents
+    w1, w2 = _validate_conditions(T1, RH1, T2, RH2)
+
+    # Find intermediate cooling point on the saturation line with moisture content w2
+    T_sat = find_T_sat(w2)
+
+    with _base_chart(bool(colorblind), dpi) as (fig, ax, background, legend, markers, segments):
+        # Plot Outside Condition, Room Condition and the intermediate cooling point
+        markers.set_offsets([(T1, w1), (T2, w2), (T_sat, w2)])
+
+        # Draw Cooling Line from Outside Condition to Cooling Point and Reheat Line from Cooling Point to Room Condition
+        segments.set_segments([[(T1, w1), (T_sat, w2)], [(T_sat, w2), (T2, w2)]])
+
+        # Label the points in the prebuilt legend
+        outside_text, room_text, cooling_text = legend.get_texts()[1:4]
+        outside_text.set_text(f'Outside Condition: {T1}°C, {RH1}% RH')
+        room_text.set_text(f'Room Condition: {T2}°C, {RH2}% RH')
+        cooling_text.set_text(f'Cooling Point: {T_sat:.2f}°C, {w2:.3f} kg/kg')
+
+        # Restore the pre-rendered grid and draw only the per-request artists on top
+        fig.canvas.restore_region(background)
+        ax.draw_artist(markers)
+        ax.draw_artist(segments)
+        ax.draw_artist(legend)
+        # frombuffer shares the canvas memory; copy it before the chart returns to the pool
+        image = Image.frombuffer('RGBA', fig.canvas.get_width_height(), fig.canvas.buffer_rgba(), 'raw', 'RGBA', 0, 1).copy()
+
+    # Save the image to a BytesIO object
+    buf = io.BytesIO()
+    image.save(buf, format=image_format, **IMAGE_FORMATS[image_format])
+
+    return buf.getvalue()
 
 def generate_question():
     """
@@ -244,9 +392,9 @@ def generate_question():
 
     return question
 
-def generate_solution(question_data, colorblind=False):
+def _parse_question_data(question_data):
     """
-    Generates solutions for the multi-part psychrometry question.
+    Extracts (T1, RH1, T2, RH2, mass_flow, Cp) from the question data.
     """
     # Extract data
     outside = question_data['data']['Outside Condition']
@@ -261,36 +409,78 @@ def generate_solution(question_data, colorblind=False):
     T2 = room['temperature']
     RH2 = room['relative_humidity']
 
-    # Calculate moisture contents
+    return T1, RH1, T2, RH2, mass_flow, Cp
+
+def generate_solution(question_data, colorblind=False, image_format="webp"):
+    """
+    Generates solutions for the multi-part psychrometry question.
+    """
+    # The answers and the chart are each memoized on the question conditions
+    return {
+        "answers": generate_answers(question_data),
+        "chart_url": _to_data_uri(generate_chart(question_data, colorblind, image_format), image_format)
+    }
+
+def generate_answers(question_data):
+    """
+    Generates only the numeric answers for the multi-part psychrometry question, without the chart.
+    """
+    T1, RH1, T2, RH2, mass_flow, Cp = _parse_question_data(question_data)
+    return copy.deepcopy(_generate_answers_cached(T1, RH1, T2, RH2, mass_flow, Cp))
+
+def generate_chart(question_data, colorblind=False, image_format="webp"):
+    """
+    Generates only the chart for the multi-part psychrometry question.
+    Returns the raw image bytes.
+    """
+    T1, RH1, T2, RH2, _, _ = _parse_question_data(question_data)
+    return generate_condition_chart(T1, RH1, T2, RH2, colorblind=colorblind, image_format=image_format)
+
+def generate_condition_chart(T1, RH1, T2, RH2, colorblind=False, image_format="webp"):
+    """
+    Generates the chart for the Outside (T1, RH1) and Room (T2, RH2) Conditions.
+    Returns the raw image bytes.
+    """
+    return _render_chart(T1, RH1, T2, RH2, bool(colorblind), image_format)
+
+# The chart depends only on the four integer conditions, so repeated questions skip rendering.
+# Each entry holds a full image (100-300 KB), so keep the cache small.
+@functools.lru_cache(maxsize=128)
+def _render_chart(T1, RH1, T2, RH2, colorblind, image_format):
+    """
+    Renders the chart for the given conditions, reporting failures as ValueError. Results are memoized.
+    """
+    # Generate the chart image with the appropriate color scheme
     try:
-        w1 = GetHumRatioFromRelHum(T1, RH1 / 100.0, 101325)
-        w2 = GetHumRatioFromRelHum(T2, RH2 / 100.0, 101325)
+        return render_psychrometric_chart(
+            point1=(T1, RH1),
+            point2=(T2, RH2),
+            colorblind=colorblind,  # Pass the colorblind flag
+            image_format=image_format
+        )
     except Exception as e:
-        logging.error(f"Moisture content calculation failed: {e}")
-        raise ValueError(f"Moisture content calculation failed: {e}")
+        logging.exception("Chart generation failed.")
+        raise ValueError(f"Chart generation failed: {e}") from e
+
+@functools.lru_cache(maxsize=4096)
+def _generate_answers_cached(T1, RH1, T2, RH2, mass_flow, Cp):
+    """
+    Computes the numeric answers for the given conditions. Results are memoized.
+    """
+    # Reject invalid conditions before computing any answers
+    _validate_conditions(T1, RH1, T2, RH2)
 
-    # Find Dew Point temperatures
+    # Calculate moisture contents, Dew Point temperatures and enthalpies (kJ/kg)
     try:
-        dew_point_outside = GetTDewPointFromRelHum(T1, RH1 / 100.0)
-        dew_point_room = GetTDewPointFromRelHum(T2, RH2 / 100.0)
-    except TypeError as te:
-        logging.error(f"TypeError in Dew Point calculation: {te}")
-        raise ValueError(f"Dew Point calculation failed: {te}")
+        w1, dew_point_outside, h1 = _point_properties(T1, RH1)
+        w2, dew_point_room, h2 = _point_properties(T2, RH2)
     except Exception as e:
-        logging.error(f"Unexpected error in Dew Point calculation: {e}")
-        raise ValueError(f"Dew Point calculation failed: {e}")
+        logging.exception("State point calculation failed.")
+        raise ValueError(f"State point calculation failed: {e}") from e
 
     if dew_point_outside is None or dew_point_room is None:
         logging.error("Dew Point calculation returned None.")
         raise ValueError("Dew Point calculation failed.")
-    
-    # Calculate enthalpy
-    try:
-        h1 = GetMoistAirEnthalpy(T1, w1)/1000  # kJ/kg
-        h2 = GetMoistAirEnthalpy(T2, w2)/1000   # kJ/kg
-    except Exception as e:
-        logging.error(f"Enthalpy calculation failed: {e}")
-        raise ValueError(f"Enthalpy calculation failed: {e}")
 
     if h1 is None or h2 is None:
         logging.error("Enthalpy calculation returned None.")
@@ -301,8 +491,8 @@ def generate_solution(question_data, colorblind=False):
         T_sat = find_T_sat(w2)
         h_sat = GetMoistAirEnthalpy(T_sat, w2)/1000
     except Exception as e:
-        logging.error(f"Saturation enthalpy calculation failed: {e}")
-        raise ValueError(f"Saturation enthalpy calculation failed: {e}")
+        logging.exception("Saturation enthalpy calculation failed.")
+        raise ValueError(f"Saturation enthalpy calculation failed: {e}") from e
 
     if h_sat is None:
         logging.error("Saturation enthalpy calculation returned None.")
@@ -326,17 +516,6 @@ def generate_solution(question_data, colorblind=False):
     cooler_load = max(cooler_load, 0)
     reheater_load = max(reheater_load, 0)
 
-    # Generate the chart image with the appropriate color scheme
-    try:
-        chart_url = plot_psychrometric_chart(
-            point1=(T1, RH1),
-            point2=(T2, RH2),
-            colorblind=colorblind  # Pass the colorblind flag
-        )
-    except Exception as e:
-        logging.error(f"Chart generation failed: {e}")
-        raise ValueError(f"Chart generation failed: {e}")
-
     # Prepare solutions
     solutions = {
         "a": "See chart below.",
@@ -355,7 +534,4 @@ def generate_solution(question_data, colorblind=False):
         "h": f"Reheater Load: {reheater_load:.2f} kW"
     }
 
-    return {
-        "answers": solutions,
-        "chart_url": chart_url
-    }
+    return solutions